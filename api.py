@@ -3,34 +3,40 @@ API interaction functions for the Perplexity AI chat interface.
 Handles all direct communication with the Perplexity API.
 """
 
+import asyncio
 import logging
+import socket
+import threading
 import time
-from typing import Any, Dict, List, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, Iterator, List, Optional
 
+import orjson
 import requests
 from requests.adapters import HTTPAdapter
-from requests.exceptions import RequestException
+from urllib3.connection import HTTPConnection
 from urllib3.util.retry import Retry
 
+from cache import ResponseCache, SemanticCache, make_cache_key
 from config import get_config
 
-# Configure logging to be less intrusive
-logging.basicConfig(
-    level=logging.WARNING,  # Only show warnings and errors by default
-    format="%(levelname)s: %(message)s",  # Simpler format
-)
 logger = logging.getLogger(__name__)
 
-# Initialize conversation messages with system prompt
-messages = [
-    {
-        "role": "system",
-        "content": (
-            "You are an artificial intelligence assistant and you need to "
-            "engage in a helpful, detailed, polite conversation with a user."
-        ),
-    }
-]
+# Default system prompt for new conversations
+SYSTEM_PROMPT = (
+    "You are an artificial intelligence assistant and you need to "
+    "engage in a helpful, detailed, polite conversation with a user."
+)
+DEFAULT_MAX_TURNS = 20
+
+# Status codes the session adapter retries after a backoff
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+BACKOFF_BASE = 0.5  # seconds
+MAX_BACKOFF = 30.0  # seconds
+POOL_MAXSIZE = 4  # pooled connections kept to the API host
+CONNECT_TIMEOUT = 5  # seconds
+READ_TIMEOUT = 180  # seconds
 
 
 class APIError(Exception):
@@ -39,6 +45,110 @@ class APIError(Exception):
     pass
 
 
+class Conversation:
+    """
+    Conversation history with a bounded sliding window of turns.
+
+    Only the most recent turns are kept, so the payload sent with each request
+    stays the same size however long the conversation runs. The system prompt
+    is always sent first.
+
+    Attributes:
+        max_turns (int): Maximum number of user/assistant exchanges to keep
+    """
+
+    def __init__(
+        self, system_prompt: str = SYSTEM_PROMPT, max_turns: int = DEFAULT_MAX_TURNS
+    ):
+        """
+        Initialize an empty conversation.
+
+        Args:
+            system_prompt (str): Instructions sent as the system message
+            max_turns (int): Maximum number of user/assistant exchanges to keep
+
+        Raises:
+            ValueError: If max_turns is not a positive integer
+        """
+        if not isinstance(max_turns, int) or max_turns < 1:
+            raise ValueError("max_turns must be a positive integer")
+        self.max_turns = max_turns
+        self._system = {"role": "system", "content": system_prompt}
+        self._turns: Deque[Dict[str, str]] = deque(maxlen=max_turns * 2)
+
+    def add_user_message(self, content: str) -> None:
+        """
+        Add a user message to the conversation.
+
+        Args:
+            content (str): The user's message
+        """
+        self._turns.append({"role": "user", "content": content})
+        # Keep the window starting on a user message after eviction
+        if self._turns[0]["role"] == "assistant":
+            self._turns.popleft()
+
+    def add_assistant_message(self, content: str) -> None:
+        """
+        Add an assistant reply to the conversation.
+
+        Args:
+            content (str): The assistant's reply
+        """
+        self._turns.append({"role": "assistant", "content": content})
+
+    def snapshot(self) -> List[Dict[str, str]]:
+        """
+        Get the messages to send with the next request.
+
+        Returns:
+            list: The system message followed by the retained turns
+        """
+        return [self._system, *self._turns]
+
+
+class CappedRetry(Retry):
+    """
+    Retry strategy that caps the server's Retry-After at the backoff limit.
+
+    urllib3 only applies backoff_max to its own computed backoff and sleeps
+    for as long as Retry-After asks, which can hang the CLI for hours.
+    """
+
+    def get_retry_after(self, response) -> Optional[float]:
+        """
+        Get the Retry-After delay in seconds, capped at backoff_max.
+
+        Args:
+            response: The response that may carry a Retry-After header
+
+        Returns:
+            Optional[float]: The capped delay, or None if the header is absent
+        """
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.backoff_max)
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """
+    HTTP adapter that enables TCP keep-alive on pooled connections.
+
+    Keep-alive probes stop idle sockets to the API being dropped between
+    requests, so the pooled TLS connection can be reused.
+    """
+
+    socket_options = HTTPConnection.default_socket_options + [
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    ]
+
+    def init_poolmanager(self, *args, **kwargs):
+        """Create the pool manager with keep-alive socket options."""
+        kwargs["socket_options"] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
 class PerplexityAPI:
     """
     Handles communication with the Perplexity API.
@@ -53,25 +163,42 @@ class PerplexityAPI:
         """Initialize the API handler with retry logic and timeouts."""
         self.session = requests.Session()
 
-        # Configure retry strategy
-        retry_strategy = Retry(
+        # Retry connection failures and error status codes inside the adapter;
+        # urllib3 handles the backoff and any Retry-After header, capped at
+        # MAX_BACKOFF
+        retry_strategy = CappedRetry(
             total=3,  # number of retries
-            backoff_factor=0.5,  # wait 0.5, 1, 2 seconds between retries
-            status_forcelist=[500, 502, 503, 504],  # retry on these status codes
+            read=False,  # a read timeout already waited READ_TIMEOUT; report it
+            backoff_factor=BACKOFF_BASE,  # wait 0, 1, 2 seconds plus jitter
+            backoff_max=MAX_BACKOFF,
+            backoff_jitter=BACKOFF_BASE,  # add up to 0.5 s to spread out clients
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset({"POST"}),
+            raise_on_status=False,  # hand back the last response for error details
         )
 
-        # Add retry adapter to session
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # Add retry adapter to session; all requests go to a single host
+        adapter = KeepAliveAdapter(
+            pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=retry_strategy
+        )
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
 
         # Get configuration
         config = get_config()
 
-        # Store config values
-        self.model_name = config.name
-        self.temperature = config.temperature
-        self.max_tokens = config.max_tokens
+        # Request settings shared by every payload; the model_name, temperature
+        # and max_tokens properties read from here so caching cannot drift
+        self._payload_template = {
+            "model": config.name,
+            "temperature": config.temperature,
+            "max_tokens": config.max_tokens,
+        }
+
+        # Response cache is opened on first use
+        self._cache: Optional[ResponseCache] = None
+        self._cache_lock = threading.Lock()
+        self._semantic_cache = SemanticCache()
 
         # Set up base URL and headers
         self.base_url = f"{config.api_base}/chat/completions"
@@ -79,6 +206,47 @@ class PerplexityAPI:
             "Authorization": f"Bearer {config.api_key}",
             "Content-Type": "application/json",
         }
+        # Attach headers to the session once rather than passing them per request
+        self.session.headers.update(self.headers)
+
+    @property
+    def model_name(self) -> str:
+        """str: Name of the model sent with each request."""
+        return self._payload_template["model"]
+
+    @property
+    def temperature(self) -> float:
+        """float: Temperature sent with each request."""
+        return self._payload_template["temperature"]
+
+    @property
+    def max_tokens(self) -> int:
+        """int: Maximum number of tokens sent with each request."""
+        return self._payload_template["max_tokens"]
+
+    @staticmethod
+    def _error_message(
+        response: requests.Response, error: requests.exceptions.HTTPError
+    ) -> str:
+        """
+        Build a readable message for a failed response.
+
+        Args:
+            response (requests.Response): The failed response
+            error (requests.exceptions.HTTPError): The error raised for it
+
+        Returns:
+            str: The API's error message if it sent one, otherwise the HTTP error
+        """
+        error_msg = f"HTTP Error: {str(error)}"
+        if response.content:
+            try:
+                error_data = orjson.loads(response.content)
+                if isinstance(error_data, dict) and "error" in error_data:
+                    error_msg = f"API Error: {error_data['error']}"
+            except ValueError:
+                pass
+        return error_msg
 
     def _make_request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -93,87 +261,151 @@ class PerplexityAPI:
         Raises:
             APIError: If there's an error communicating with the API
         """
-        max_retries = 3
-        retry_count = 0
-        connect_timeout = 5
-        read_timeout = 180
+        start_time = time.time()
+        try:
+            logger.debug("Making API request...")  # Changed to debug level
+            response = self.session.post(
+                self.base_url,
+                data=orjson.dumps(payload),
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+            )
+            elapsed_time = time.time() - start_time
+            logger.debug(
+                f"API request completed in {elapsed_time:.2f} seconds"
+            )  # Changed to debug level
+
+            response.raise_for_status()
+            return orjson.loads(response.content)
+
+        except requests.exceptions.Timeout:
+            raise APIError(
+                "Request timed out. "
+                "The model might be taking longer than expected to process your query. "
+                "Try breaking your question into smaller parts."
+            )
+        # Exhausted status retries return the last response (raise_on_status is
+        # off); exhausted connection retries surface as ConnectionError
+        except requests.exceptions.ConnectionError:
+            raise APIError(
+                "Could not connect to the API. Please check your internet connection."
+            )
+        except requests.exceptions.HTTPError as e:
+            raise APIError(self._error_message(response, e))
+        except Exception as e:
+            raise APIError(f"Unexpected error: {str(e)}")
+
+    def _stream_request(self, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Make a streaming request and yield each server-sent event.
 
-        while retry_count < max_retries:
-            try:
-                start_time = time.time()
-                logger.debug("Making API request...")  # Changed to debug level
-                response = self.session.post(
-                    self.base_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=(connect_timeout, read_timeout),
-                )
-                elapsed_time = time.time() - start_time
-                logger.debug(
-                    f"API request completed in {elapsed_time:.2f} seconds"
-                )  # Changed to debug level
-
-                if response.status_code == 500 and retry_count < max_retries - 1:
-                    retry_count += 1
-                    wait_time = 0.5 * (2**retry_count)
-                    logger.warning(
-                        f"Request failed, retrying in {wait_time:.1f} seconds..."
-                    )  # Keep as warning
-                    time.sleep(wait_time)  # Exponential backoff
-                    continue
+        Failures before the stream starts are retried by the session adapter;
+        a stream that breaks part way is not, since it cannot be resumed.
+
+        Args:
+            payload (dict): The request payload
 
+        Yields:
+            dict: Each decoded event chunk from the API
+
+        Raises:
+            APIError: If there's an error communicating with the API
+        """
+        body = orjson.dumps({**payload, "stream": True})
+        try:
+            response = self.session.post(
+                self.base_url,
+                data=body,
+                stream=True,
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+            )
+        except requests.exceptions.Timeout:
+            raise APIError("Request timed out while waiting for the stream to start.")
+        except requests.exceptions.ConnectionError:
+            raise APIError(
+                "Could not connect to the API. Please check your internet connection."
+            )
+
+        with response:
+            try:
                 response.raise_for_status()
-                return response.json()
-
-            except requests.exceptions.Timeout:
-                if retry_count < max_retries - 1:
-                    retry_count += 1
-                    wait_time = 0.5 * (2**retry_count)
-                    logger.warning(
-                        f"Request timed out, retrying in {wait_time:.1f} seconds..."
-                    )  # Keep as warning
-                    time.sleep(wait_time)
-                    continue
-                raise APIError(
-                    "Request timed out after multiple attempts. "
-                    "The model might be taking longer than expected to process your query. "
-                    "Try breaking your question into smaller parts."
-                )
-            except requests.exceptions.ConnectionError:
-                raise APIError(
-                    "Could not connect to the API. Please check your internet connection."
-                )
             except requests.exceptions.HTTPError as e:
-                error_msg = f"HTTP Error: {str(e)}"
-                if response.text:
+                raise APIError(self._error_message(response, e))
+
+            try:
+                for line in response.iter_lines():
+                    if not line.startswith(b"data:"):
+                        continue  # Skip keep-alive blank lines and comments
+                    data = line[5:].strip()
+                    if data == b"[DONE]":
+                        break
                     try:
-                        error_data = response.json()
-                        if "error" in error_data:
-                            error_msg = f"API Error: {error_data['error']}"
-                    except ValueError:
-                        pass
-                if response.status_code == 500 and retry_count < max_retries - 1:
-                    retry_count += 1
-                    wait_time = 0.5 * (2**retry_count)
-                    logger.warning(
-                        f"Request failed, retrying in {wait_time:.1f} seconds..."
-                    )  # Keep as warning
-                    time.sleep(wait_time)
-                    continue
-                raise APIError(error_msg)
-            except Exception as e:
-                raise APIError(f"Unexpected error: {str(e)}")
-
-        raise APIError(
-            "Maximum retries exceeded. The API might be experiencing issues."
-        )
+                        event = orjson.loads(data)
+                    except orjson.JSONDecodeError as e:
+                        raise APIError("Invalid JSON in stream chunk") from e
+                    yield event
+            except requests.exceptions.RequestException as e:
+                raise APIError(f"Stream interrupted: {str(e)}")
+
+    @staticmethod
+    def _delta_content(event: Any) -> Optional[str]:
+        """
+        Get the text fragment carried by a stream event.
+
+        Args:
+            event: A decoded event chunk from the API
+
+        Returns:
+            Optional[str]: The fragment, or None if the event carries no text
 
-    def get_completion(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        Raises:
+            APIError: If the event does not have the expected shape
+        """
+        if not isinstance(event, dict):
+            raise APIError("Invalid stream chunk")
+        choices = event.get("choices") or [{}]
+        choice = choices[0] if isinstance(choices, list) else None
+        delta = choice.get("delta", {}) if isinstance(choice, dict) else None
+        if not isinstance(delta, dict):
+            raise APIError("Invalid stream chunk")
+        return delta.get("content")
+
+    def _get_cache(self) -> ResponseCache:
+        """
+        Get the response cache, opening it if necessary.
+
+        Returns:
+            ResponseCache: The on-disk response cache
+        """
+        # Double-checked so concurrent first calls open a single cache
+        if self._cache is None:
+            with self._cache_lock:
+                if self._cache is None:
+                    cache = ResponseCache()
+                    cache.expire()  # Evict stale responses from earlier runs
+                    self._cache = cache
+        return self._cache
+
+    def get_completion(
+        self,
+        messages: List[Dict[str, str]],
+        cache: Optional[bool] = None,
+        match_similar: bool = False,
+    ) -> Dict[str, Any]:
         """
         Get a completion from the API.
 
+        Responses are cached on disk when the temperature is 0, since only then
+        is the same request expected to produce the same answer.
+
         Args:
             messages (list): List of message dictionaries
+            cache (bool, optional): Force caching on or off. Defaults to caching
+                only when the temperature is 0.
+            match_similar (bool): Also reuse the response to an earlier prompt
+                with nearly the same words as this one, within this process.
+                This ignores case and punctuation but does not match
+                paraphrases. Off by default, since a small wording change
+                such as a negation can ask a different question.
 
         Returns:
             dict: The API response
@@ -181,18 +413,144 @@ class PerplexityAPI:
         Raises:
             APIError: If there's an error communicating with the API
         """
-        payload = {
-            "model": self.model_name,
-            "messages": messages,
-            "temperature": self.temperature,
-            "max_tokens": self.max_tokens,
-        }
+        payload = self._payload_template | {"messages": messages}
+
+        use_cache = self.temperature == 0 if cache is None else cache
+        if not use_cache:
+            return self._make_request(payload)
+
+        key = make_cache_key(
+            self.model_name, self.temperature, self.max_tokens, messages
+        )
+        response_cache = self._get_cache()
+        cached = response_cache.get(key)
+        if cached is not None:
+            logger.debug("Returning cached response")
+            return cached
+
+        if not match_similar:
+            response = self._make_request(payload)
+            response_cache.set(key, response)
+            return response
+
+        # Fall back to matching the last prompt against similar earlier ones
+        context_key = make_cache_key(
+            self.model_name, self.temperature, self.max_tokens, messages[:-1]
+        )
+        prompt = messages[-1]["content"] if messages else ""
+        cached = self._semantic_cache.get(context_key, prompt)
+        if cached is not None:
+            logger.debug("Returning cached response for similar prompt")
+            return cached
+
+        response = self._make_request(payload)
+        response_cache.set(key, response)
+        self._semantic_cache.add(context_key, prompt, response)
+        return response
+
+    async def aget_completion(
+        self,
+        messages: List[Dict[str, str]],
+        cache: Optional[bool] = None,
+        match_similar: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Get a completion from the API without blocking the event loop.
+
+        The request runs on a worker thread and shares the session's
+        connection pool, so several calls can be awaited together with
+        asyncio.gather.
+
+        Args:
+            messages (list): List of message dictionaries
+            cache (bool, optional): Force caching on or off. Defaults to caching
+                only when the temperature is 0.
+            match_similar (bool): Also reuse the response to an earlier prompt
+                that is a near-duplicate of this one. See get_completion.
+
+        Returns:
+            dict: The API response
+
+        Raises:
+            APIError: If there's an error communicating with the API
+        """
+        return await asyncio.to_thread(
+            self.get_completion, messages, cache, match_similar
+        )
+
+    def get_completion_stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """
+        Get a completion from the API as it is generated.
+
+        Streamed responses are never cached.
+
+        Args:
+            messages (list): List of message dictionaries
+
+        Yields:
+            str: Fragments of the response text, in order
+
+        Raises:
+            APIError: If there's an error communicating with the API
+        """
+        payload = self._payload_template | {"messages": messages}
 
-        return self._make_request(payload)
+        for chunk in self._stream_request(payload):
+            content = self._delta_content(chunk)
+            if content:
+                yield content
 
+    def get_completion_batch(
+        self, messages_list: List[List[Dict[str, str]]], max_workers: int = 4
+    ) -> List[Dict[str, Any]]:
+        """
+        Get completions for several independent conversations concurrently.
 
-# Initialize API handler
-api = PerplexityAPI()
+        Requests share the session's connection pool, so the batch takes
+        roughly as long as its slowest request rather than the sum of all.
+        At most POOL_MAXSIZE requests run at once, since connections opened
+        beyond the pool size would be discarded instead of kept alive.
+
+        Args:
+            messages_list (list): One list of message dictionaries per request
+            max_workers (int): Maximum number of requests in flight at once,
+                capped at POOL_MAXSIZE
+
+        Returns:
+            list: The API responses, in the same order as messages_list
+
+        Raises:
+            APIError: If there's an error communicating with the API
+        """
+        max_workers = min(max_workers, POOL_MAXSIZE)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(self.get_completion, messages_list))
+
+
+# Shared API handler, created on first use
+_api_instance: Optional[PerplexityAPI] = None
+_api_lock = threading.Lock()
+
+
+def get_api() -> PerplexityAPI:
+    """
+    Get the shared API handler, creating it on first use.
+
+    Creation is guarded by a lock so concurrent first calls share one
+    handler and its connection pool.
+
+    Returns:
+        PerplexityAPI: The API handler
+
+    Raises:
+        ConfigurationError: If the configuration is invalid
+    """
+    global _api_instance
+    if _api_instance is None:
+        with _api_lock:
+            if _api_instance is None:
+                _api_instance = PerplexityAPI()
+    return _api_instance
 
 
 def call_perplexity_api(messages: List[Dict[str, str]]) -> Dict[str, Any]:
@@ -208,14 +566,5 @@ def call_perplexity_api(messages: List[Dict[str, str]]) -> Dict[str, Any]:
     Raises:
         APIError: If there's an error communicating with the API
     """
-    return api.get_completion(messages)
-
-
-def add_user_message(question: str) -> None:
-    """
-    Add a user message to the conversation history.
+    return get_api().get_completion(messages)
 
-    Args:
-        question (str): The user's question to add.
-    """
-    messages.append({"role": "user", "content": question})
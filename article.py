@@ -5,28 +5,44 @@ Handles content parsing and UK English conversion.
 
 import json
 import logging
+import os
 import re
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
 
-import nltk
-from nltk.corpus import wordnet
-from nltk.tokenize import sent_tokenize, word_tokenize
+import orjson
+
+from utils import clean_think_tags
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Download required NLTK data
-try:
-    nltk.data.find("tokenizers/punkt")
-    nltk.data.find("corpora/wordnet")
-except LookupError:
-    logger.info("Downloading required NLTK data...")
-    nltk.download("punkt")
-    nltk.download("wordnet")
-    nltk.download("averaged_perceptron_tagger")
-    logger.info("NLTK data download complete.")
+# American to British spelling map (lowercase keys and values)
+_US_TO_UK_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "us_to_uk.json"
+)
+
+
+# Precompiled patterns used when parsing responses
+# One pass for punctuation spacing, newline runs and other whitespace runs.
+# URLs are matched whole and punctuation is never joined to the start of
+# one, so the punctuation rule cannot split them. A lone space is left
+# unmatched since it needs no replacement.
+_CLEAN_RE = re.compile(
+    r'(https?://[^\s<>"]+|www\.[^\s<>"]+)'
+    r"|([.!?])\s*(?!https?://|www\.)(\w)|(\n{3,})|[^\S\n]{2,}|[^\S\n ]"
+)
+# URLs on numbered source lines such as "1. https://example.com" or
+# "[2] https://example.com" capture their number; any other URL is matched alone
+_CITATION_RE = re.compile(
+    r'^[^\S\n]*\[?(\d+)[.\]][^\S\n]+(https?://[^\s<>"]+|www\.[^\s<>"]+)'
+    r'|(https?://[^\s<>"]+|www\.[^\s<>"]+)',
+    re.MULTILINE,
+)
+# Control character used to join fields for a single conversion pass
+_FIELD_SEPARATOR = "\x1e"
+# URLs are matched first so words inside them are left alone
+_TOKEN_RE = re.compile(r'(https?://[^\s<>"]+|www\.[^\s<>"]+)|\b([A-Za-z]+)\b')
 
 
 class ArticleError(Exception):
@@ -66,34 +82,73 @@ class Article:
         """
         Extract title and description from the text.
 
+        The first line is expected to look like "# Title: Description", where
+        the description is optional.
+
         Args:
             text (str): Raw text to process
 
         Returns:
             Tuple[str, str]: Title and description
         """
-        title_match = re.match(r"^#\s*([^:]+)(?::(.+))?", text, re.MULTILINE)
-        if not title_match:
+        first_line, _, _ = text.partition("\n")
+        title, _, description = first_line[1:].partition(":")
+        title = title.strip()
+        if not first_line.startswith("#") or not title:
             logger.warning("No title found in text, using default")
             return "Untitled", ""
 
-        title = title_match.group(1).strip()
-        description = (title_match.group(2) or "").strip()
-        return title, description
+        return title, description.strip()
 
     @staticmethod
     def _extract_citations(citation_text: str) -> List[Dict[str, Any]]:
         """
         Extract citations from the text.
 
+        Citations are listed in order of appearance. URLs on numbered source
+        lines keep their own numbers; any other URL, such as a bare URL or a
+        markdown link, is numbered after the highest of those.
+
         Args:
             citation_text (str): Text containing citations
 
         Returns:
             List[Dict[str, Any]]: List of citation objects
         """
-        urls = re.findall(r'https?://[^\s<>"]+|www\.[^\s<>"]+', citation_text)
-        return [{"number": i + 1, "url": url} for i, url in enumerate(urls)]
+        matches = list(_CITATION_RE.finditer(citation_text))
+        number = max((int(match[1]) for match in matches if match[1]), default=0)
+
+        citations = []
+        for match in matches:
+            if match[1]:
+                citations.append({"number": int(match[1]), "url": match[2]})
+            else:
+                number += 1
+                citations.append({"number": number, "url": match[3]})
+        return citations
+
+    @staticmethod
+    def _clean_match(match: re.Match) -> str:
+        """
+        Replacement for a single match of the content cleaning pattern.
+
+        Args:
+            match (re.Match): Match from the cleaning pattern
+
+        Returns:
+            str: Text to substitute for the match
+        """
+        if match.group(1) is not None:
+            # Leave URLs untouched
+            return match.group(1)
+        if match.group(2) is not None:
+            # Ensure proper spacing after punctuation
+            return f"{match.group(2)} {match.group(3)}"
+        if match.group(4) is not None:
+            # Remove multiple newlines (preserve at least one blank line)
+            return "\n\n"
+        # Replace other whitespace runs with a single space (preserving newlines)
+        return " "
 
     @staticmethod
     def _clean_content(content: str) -> str:
@@ -106,19 +161,11 @@ class Article:
         Returns:
             str: Cleaned and formatted content
         """
-        # Remove think tags
-        content = re.sub(r"<think>.*?</think>", "", content, flags=re.DOTALL)
-
-        # Remove multiple newlines (preserve at least one)
-        content = re.sub(r"\n{3,}", "\n\n", content)
-
-        # Ensure proper spacing after punctuation
-        content = re.sub(r"([.!?])\s*(\w)", r"\1 \2", content)
+        # Remove think tags first, since removing them can join text around them
+        content = clean_think_tags(content)
 
-        # Replace multiple spaces with a single space (but preserve newlines)
-        content = re.sub(r"[^\S\n]+", " ", content)
-
-        return content.strip()
+        # Fix punctuation spacing and collapse whitespace in a single pass
+        return _CLEAN_RE.sub(Article._clean_match, content).strip()
 
     @classmethod
     def from_response(cls, text: str) -> "Article":
@@ -152,15 +199,14 @@ class Article:
                 citations = cls._extract_citations(citation_text)
 
             # Get main content (remove title/description line)
-            content_lines = content_text.split("\n")
-            content = (
-                "\n".join(content_lines[1:]).strip() if len(content_lines) > 1 else ""
-            )
+            _, _, content = content_text.partition("\n")
+            content = content.strip()
 
-            # Convert to UK English
-            uk_title = convert_to_uk_english(title)
-            uk_description = convert_to_uk_english(description)
-            uk_content = convert_to_uk_english(content)
+            # Convert all three fields to UK English in a single pass
+            joined = _FIELD_SEPARATOR.join((title, description, content))
+            uk_title, uk_description, uk_content = convert_to_uk_english(
+                joined
+            ).split(_FIELD_SEPARATOR, 2)
 
             return cls(
                 title=uk_title,
@@ -195,7 +241,8 @@ class Article:
             # Add citations as JSON
             if self.citations:
                 parts.append("```json")
-                parts.append(json.dumps(self.citations, indent=2))
+                citations_json = orjson.dumps(self.citations, option=orjson.OPT_INDENT_2)
+                parts.append(citations_json.decode("utf-8"))
                 parts.append("```")
 
             # Join with double newlines for proper markdown spacing
@@ -205,9 +252,72 @@ class Article:
             raise ArticleError(f"Failed to generate markdown: {str(e)}") from e
 
 
+@lru_cache(maxsize=1)
+def _us_to_uk_map() -> Dict[str, str]:
+    """
+    Load the US to UK spelling map on first use.
+
+    Returns:
+        Dict[str, str]: Lowercase American spellings mapped to British ones
+    """
+    with open(_US_TO_UK_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _match_case(original: str, replacement: str) -> str:
+    """
+    Apply the capitalisation of one word to another.
+
+    Args:
+        original (str): The word whose case should be copied
+        replacement (str): The lowercase word to re-case
+
+    Returns:
+        str: The replacement in the same case as the original
+    """
+    if original.isupper() and len(original) > 1:
+        return replacement.upper()
+    if original[0].isupper():
+        return replacement[0].upper() + replacement[1:]
+    return replacement
+
+
+def _to_uk_word(word: str) -> str:
+    """
+    Convert a single word to its UK English spelling.
+
+    Args:
+        word (str): A word made up of ASCII letters
+
+    Returns:
+        str: The UK English spelling of the word, or the word unchanged
+    """
+    uk_word = _us_to_uk_map().get(word.lower())
+    if uk_word is None:
+        return word
+    return _match_case(word, uk_word)
+
+
+def _convert_token(match: re.Match) -> str:
+    """
+    Convert a word matched by the tokenizer, leaving URLs untouched.
+
+    Args:
+        match (re.Match): Match from the token pattern
+
+    Returns:
+        str: The converted word, or the matched text unchanged
+    """
+    word = match.group(2)
+    return _to_uk_word(word) if word else match.group(0)
+
+
 def convert_to_uk_english(text: str) -> str:
     """
-    Convert American English text to UK English using NLTK for proper word tokenization.
+    Convert American English spellings in text to UK English.
+
+    Words are found with a single regex pass and looked up in a bundled
+    US to UK spelling map. Whitespace, punctuation and URLs are preserved.
 
     Args:
         text (str): Text in American English
@@ -215,41 +325,4 @@ def convert_to_uk_english(text: str) -> str:
     Returns:
         str: Text converted to UK English
     """
-    try:
-        # Tokenize into sentences first to preserve structure
-        sentences = sent_tokenize(text)
-        converted_sentences = []
-
-        for sentence in sentences:
-            # Tokenize sentence into words
-            words = word_tokenize(sentence)
-
-            # Process each word
-            processed_words = []
-            for word in words:
-                # Skip if not a word
-                if not re.match(r"^[a-zA-Z]+$", word):
-                    processed_words.append(word)
-                    continue
-
-                # Get synsets and process
-                synsets = wordnet.synsets(word)
-                if synsets:
-                    lemma = synsets[0].lemmas()[0]
-                    if lemma.name().endswith("_us"):
-                        uk_lemma = lemma.name().replace("_us", "_uk")
-                        processed_words.append(uk_lemma)
-                    else:
-                        processed_words.append(word)
-                else:
-                    processed_words.append(word)
-
-            # Reconstruct sentence
-            converted_sentences.append(" ".join(processed_words))
-
-        # Join sentences with proper spacing
-        return " ".join(converted_sentences)
-
-    except Exception as e:
-        logger.error(f"Error converting to UK English: {str(e)}")
-        return text  # Return original text if conversion fails
+    return _TOKEN_RE.sub(_convert_token, text)
@@ -0,0 +1,256 @@
+"""
+Response caching for the Perplexity AI chat interface.
+Stores API responses on disk so repeated requests skip the network round-trip,
+and can match near-identical prompts against earlier responses in memory.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from difflib import SequenceMatcher
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+DEFAULT_CACHE_PATH = ".pplx_cache.sqlite3"
+DEFAULT_TTL_SECONDS = 24 * 60 * 60  # Cached responses expire after a day
+DEFAULT_SIMILARITY_THRESHOLD = 0.9
+DEFAULT_MAX_ENTRIES = 32  # Similar-prompt entries kept per context
+DEFAULT_MAX_CONTEXTS = 64  # Contexts kept before the least recent is dropped
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# A cached prompt's tokens paired with its response
+_Entry = Tuple[Tuple[str, ...], Dict[str, Any]]
+
+
+def make_cache_key(
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    messages: List[Dict[str, str]],
+) -> str:
+    """
+    Build a stable cache key for a completion request.
+
+    Args:
+        model (str): Name of the model
+        temperature (float): Temperature setting for the request
+        max_tokens (int): Maximum number of tokens in the response
+        messages (list): List of message dictionaries
+
+    Returns:
+        str: SHA-256 hex digest identifying the request
+    """
+    key_data = {"m": model, "t": temperature, "mt": max_tokens, "msgs": messages}
+    encoded = json.dumps(key_data, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent SQLite-backed cache of API responses.
+
+    The connection is shared between threads, so every statement runs under
+    a lock.
+
+    Attributes:
+        path (str): Location of the SQLite database file
+        ttl (int): Number of seconds a cached response stays valid
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: int = DEFAULT_TTL_SECONDS):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path (str): Location of the SQLite database file
+            ttl (int): Number of seconds a cached response stays valid
+        """
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): Cache key for the request
+
+        Returns:
+            Optional[dict]: The cached response, or None if missing or expired
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any], expire: Optional[int] = None) -> None:
+        """
+        Store a response in the cache.
+
+        Args:
+            key (str): Cache key for the request
+            value (dict): The API response to store
+            expire (int, optional): Seconds until expiry. Defaults to the cache TTL.
+        """
+        ttl = self.ttl if expire is None else expire
+        encoded = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) "
+                "VALUES (?, ?, ?)",
+                (key, encoded, time.time() + ttl),
+            )
+            self._conn.commit()
+
+    def expire(self) -> int:
+        """
+        Remove all expired responses from the cache.
+
+        Returns:
+            int: Number of responses removed
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM responses WHERE expires_at <= ?", (time.time(),)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def _tokenize(text: str) -> Tuple[str, ...]:
+    """
+    Split text into lowercase word tokens, keeping their order.
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        Tuple[str, ...]: Tokens in the order they appear
+    """
+    return tuple(_TOKEN_RE.findall(text.lower()))
+
+
+class SemanticCache:
+    """
+    In-memory cache that matches near-duplicate prompts.
+
+    This is a normalised near-exact match, not semantic similarity. Prompts
+    are lowercased, split into words and compared as word sequences, so
+    "What is Python?" matches "what is python" but not a paraphrase such as
+    "Tell me about Python", and reordered words such as "USD to EUR" and
+    "EUR to USD" do not match. Only entries sharing the same
+    context (model settings and earlier conversation turns) are compared.
+    Each context keeps its most recent entries, and the least recently used
+    contexts are dropped once there are too many.
+
+    Attributes:
+        similarity_threshold (float): Minimum similarity for a cache hit
+        max_entries (int): Maximum number of entries kept per context
+        max_contexts (int): Maximum number of contexts kept
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_contexts: int = DEFAULT_MAX_CONTEXTS,
+    ):
+        """
+        Initialize an empty semantic cache.
+
+        Args:
+            similarity_threshold (float): Minimum similarity for a cache hit
+            max_entries (int): Maximum number of entries kept per context
+            max_contexts (int): Maximum number of contexts kept
+        """
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.max_contexts = max_contexts
+        self._entries: "OrderedDict[str, Deque[_Entry]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, context_key: str, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Find the cached response for the most similar prompt.
+
+        Args:
+            context_key (str): Key identifying the request context
+            prompt (str): The prompt to match
+
+        Returns:
+            Optional[dict]: The best matching response, or None if no cached
+                prompt meets the similarity threshold
+        """
+        with self._lock:
+            entries = self._entries.get(context_key)
+            if not entries:
+                return None
+            self._entries.move_to_end(context_key)
+            # Score a copy so other threads can add entries meanwhile
+            entries = tuple(entries)
+
+        tokens = _tokenize(prompt)
+        threshold = self.similarity_threshold
+        # The matcher caches details of the second sequence, so set it once
+        matcher = SequenceMatcher(None, autojunk=False)
+        matcher.set_seq2(tokens)
+        best_score = 0.0
+        best_response = None
+        for cached_tokens, response in entries:
+            if not tokens and not cached_tokens:
+                score = 1.0
+            else:
+                matcher.set_seq1(cached_tokens)
+                # Cheap upper bounds rule out most entries before the full ratio
+                if matcher.real_quick_ratio() < threshold:
+                    continue
+                if matcher.quick_ratio() < threshold:
+                    continue
+                score = matcher.ratio()
+            if score > best_score:
+                best_score, best_response = score, response
+
+        if best_score >= threshold:
+            return best_response
+        return None
+
+    def add(self, context_key: str, prompt: str, response: Dict[str, Any]) -> None:
+        """
+        Store a response for a prompt, evicting the oldest entries if needed.
+
+        Args:
+            context_key (str): Key identifying the request context
+            prompt (str): The prompt that produced the response
+            response (dict): The API response to store
+        """
+        tokens = _tokenize(prompt)
+        with self._lock:
+            entries = self._entries.get(context_key)
+            if entries is None:
+                entries = self._entries[context_key] = deque(maxlen=self.max_entries)
+                if len(self._entries) > self.max_contexts:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(context_key)
+            entries.append((tokens, response))
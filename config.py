@@ -4,10 +4,9 @@ Handles environment variables and model settings.
 """
 
 import os
-from dataclasses import dataclass, field
-from typing import Optional
-
-from dotenv import load_dotenv
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
 
 
 class ConfigurationError(Exception):
@@ -16,7 +15,7 @@ class ConfigurationError(Exception):
     pass
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ModelConfig:
     """
     Configuration settings for the Perplexity AI model.
@@ -27,6 +26,7 @@ class ModelConfig:
         temperature (float): Temperature setting for response generation
         max_tokens (int): Maximum number of tokens in the response
         api_key (str): API key for authentication
+        max_history (int): Maximum number of conversation turns sent per request
     """
 
     name: str = "sonar-deep-research"
@@ -34,6 +34,7 @@ class ModelConfig:
     temperature: float = 0.7
     max_tokens: int = 4000  # Increased for longer responses
     api_key: Optional[str] = None
+    max_history: int = 20
 
     def __post_init__(self):
         """Validate configuration after initialization."""
@@ -52,6 +53,9 @@ class ModelConfig:
         if not isinstance(self.max_tokens, int) or self.max_tokens <= 0:
             raise ConfigurationError("max_tokens must be a positive integer")
 
+        if not isinstance(self.max_history, int) or self.max_history <= 0:
+            raise ConfigurationError("max_history must be a positive integer")
+
         if not self.name or not isinstance(self.name, str):
             raise ConfigurationError("Model name must be a non-empty string")
 
@@ -69,6 +73,9 @@ class ModelConfig:
         """
         Load configuration from environment variables.
 
+        Settings from the .env file never override variables already set
+        in the environment.
+
         Args:
             env_file: Whether to load from .env file. Defaults to True.
 
@@ -78,44 +85,55 @@ class ModelConfig:
         Raises:
             ConfigurationError: If required environment variables are missing
         """
+        env = os.environ
+
         if env_file:
             # Load environment variables from file
+            from dotenv import load_dotenv
+
             load_dotenv()
 
         # Get API key first and validate it immediately
-        api_key = os.getenv("PPLX_API_KEY")
+        api_key = env.get("PPLX_API_KEY")
         if not api_key:
             raise ConfigurationError(
                 "PPLX_API_KEY environment variable is not set. "
                 "Please set it in your .env file or environment variables."
             )
 
-        # Create instance with default values and API key
-        config = cls(api_key=api_key)
-
         # Override defaults with environment variables if they exist
-        if temp := os.getenv("PPLX_TEMPERATURE"):
-            config.temperature = float(temp)
+        overrides: Dict[str, Any] = {"api_key": api_key}
+        if temp := env.get("PPLX_TEMPERATURE"):
+            overrides["temperature"] = float(temp)
 
-        if tokens := os.getenv("PPLX_MAX_TOKENS"):
-            config.max_tokens = int(tokens)
+        if tokens := env.get("PPLX_MAX_TOKENS"):
+            overrides["max_tokens"] = int(tokens)
 
-        if model := os.getenv("PPLX_MODEL"):
-            config.name = model
+        if history := env.get("PPLX_MAX_HISTORY"):
+            overrides["max_history"] = int(history)
 
-        if base := os.getenv("PPLX_API_BASE"):
-            config.api_base = base
+        if model := env.get("PPLX_MODEL"):
+            overrides["name"] = model
 
-        return config
+        if base := env.get("PPLX_API_BASE"):
+            overrides["api_base"] = base
+
+        # Build and validate the instance once with all settings applied
+        return cls(**overrides)
 
 
 # Initialize configuration
 _config_instance = None
+_config_lock = threading.Lock()
 
 
-def get_config(env_file: bool = True):
+def get_config(env_file: bool = True) -> ModelConfig:
     """
-    Get the configuration, initializing it if necessary.
+    Get the configuration, loading it on first use.
+
+    The result is cached, so the environment and .env file are only read
+    once per process. Loading is guarded by a lock so concurrent first
+    calls build the configuration only once.
 
     Args:
         env_file: Whether to load from .env file. Defaults to True.
@@ -128,7 +146,9 @@ def get_config(env_file: bool = True):
     """
     global _config_instance
     if _config_instance is None:
-        _config_instance = ModelConfig.load_from_env(env_file=env_file)
+        with _config_lock:
+            if _config_instance is None:
+                _config_instance = ModelConfig.load_from_env(env_file=env_file)
     return _config_instance
 
 
@@ -138,4 +158,5 @@ def reset_config():
     This is primarily used for testing purposes.
     """
     global _config_instance
-    _config_instance = None
+    with _config_lock:
+        _config_instance = None
@@ -4,16 +4,20 @@ This script provides a command-line interface to interact with Perplexity AI,
 with features like progress tracking and multiline input support.
 """
 
+import logging
 import os
 import sys
-import time
-from typing import NoReturn
+from typing import NoReturn, Optional
 
-from api import APIError, add_user_message, call_perplexity_api, messages
+from api import APIError, Conversation, call_perplexity_api
 from article import Article
 from config import get_config
 from utils import ProgressBar, get_multiline_input
 
+# Settings shown in error output, captured once the configuration has loaded
+_MODEL_NAME: Optional[str] = None
+_API_BASE: Optional[str] = None
+
 
 def handle_error(error: Exception) -> NoReturn:
     """
@@ -33,11 +37,11 @@ def handle_error(error: Exception) -> NoReturn:
     else:
         print(f"\nAn unexpected error occurred: {str(error)}")
 
-    # Print debug information for all errors
-    config = get_config()
-    print("\nDebug information:")
-    print(f"Model: {config.name}")
-    print(f"API Base: {config.api_base}")
+    # Print debug information for all errors, if the configuration loaded
+    if _MODEL_NAME is not None:
+        print("\nDebug information:")
+        print(f"Model: {_MODEL_NAME}")
+        print(f"API Base: {_API_BASE}")
     sys.exit(1)
 
 
@@ -46,20 +50,29 @@ def main() -> None:
     Main function to run the AI chat interface.
     Gets user input, processes it through the API, and returns a structured article.
     """
+    # Configure logging to be less intrusive
+    logging.basicConfig(
+        level=logging.WARNING,  # Only show warnings and errors by default
+        format="%(levelname)s: %(message)s",  # Simpler format
+    )
+
+    global _MODEL_NAME, _API_BASE
+
     try:
+        # Load configuration up front so errors are reported before prompting
+        config = get_config()
+        _MODEL_NAME = config.name
+        _API_BASE = config.api_base
+
         # Get user's question
         user_question = get_multiline_input()
-        add_user_message(user_question)
+        conversation = Conversation(max_turns=config.max_history)
+        conversation.add_user_message(user_question)
 
         print("\nSending request to model\nAccessing deep research,\nThis could take a few minutes to complete...")
         progress = ProgressBar()
-        progress.start()
-
-        try:
-            response = call_perplexity_api(messages)
-            print("\nReceived response from API")
-        finally:
-            progress.stop()
+        response = progress.run(call_perplexity_api, conversation.snapshot())
+        print("\nReceived response from API")
 
         # Debug: Print the raw response content
         print("\nRaw response content:")
@@ -2,17 +2,31 @@
 Tests for API functionality.
 """
 
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
 import pytest
 import responses
+import urllib3.util.retry
 from requests.exceptions import Timeout as TimeoutError
 
-from api import APIError, PerplexityAPI, add_user_message, messages
+import api as api_module
+from api import MAX_BACKOFF, POOL_MAXSIZE, APIError, Conversation, PerplexityAPI, get_api
+from cache import ResponseCache
+from config import reset_config
 
 
 @pytest.fixture
-def api():
+def api(monkeypatch):
     """Create a test API instance."""
-    return PerplexityAPI()
+    monkeypatch.setenv("PPLX_API_KEY", "test-key")
+    reset_config()
+    yield PerplexityAPI()
+    reset_config()
 
 
 @responses.activate
@@ -55,6 +69,26 @@ def test_api_error_handling(api):
     assert "Invalid API key" in str(exc.value)
 
 
+@pytest.mark.parametrize("body", ['"internal error"', "500", "[1, 2]"])
+@responses.activate
+def test_api_error_body_not_an_object(api, body):
+    """Test error bodies that are valid JSON but not objects."""
+    responses.add(
+        responses.POST,
+        "https://api.perplexity.ai/chat/completions",
+        body=body,
+        status=400,
+        content_type="application/json",
+    )
+
+    request = [{"role": "user", "content": "test"}]
+    with pytest.raises(APIError) as exc:
+        api.get_completion(request)
+    assert "HTTP Error" in str(exc.value)
+    with pytest.raises(APIError):
+        list(api.get_completion_stream(request))
+
+
 @responses.activate
 def test_timeout_handling(api):
     """Test timeout handling."""
@@ -70,19 +104,49 @@ def test_timeout_handling(api):
     assert "timed out" in str(exc.value)
 
 
+def test_get_api_is_shared(monkeypatch):
+    """Test concurrent first calls to get_api share one handler."""
+    monkeypatch.setenv("PPLX_API_KEY", "test-key")
+    monkeypatch.setattr(api_module, "_api_instance", None)
+    reset_config()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        handlers = list(executor.map(lambda _: get_api(), range(8)))
+    assert all(handler is handlers[0] for handler in handlers)
+    reset_config()
+
+
 def test_message_handling():
     """Test message handling."""
-    # Clear existing messages
-    messages.clear()
-    messages.append({"role": "system", "content": "You are an AI assistant"})
+    conversation = Conversation("You are an AI assistant")
 
     # Test adding a message
-    add_user_message("test question")
+    conversation.add_user_message("test question")
+    messages = conversation.snapshot()
     assert len(messages) == 2
+    assert messages[0] == {"role": "system", "content": "You are an AI assistant"}
     assert messages[-1]["role"] == "user"
     assert messages[-1]["content"] == "test question"
 
 
+def test_conversation_window():
+    """Test that old turns are dropped once the window is full."""
+    conversation = Conversation("system", max_turns=2)
+    for i in range(3):
+        conversation.add_user_message(f"question {i}")
+        conversation.add_assistant_message(f"answer {i}")
+    conversation.add_user_message("question 3")
+
+    messages = conversation.snapshot()
+    assert messages[0]["role"] == "system"
+    assert messages[1] == {"role": "user", "content": "question 2"}
+    assert messages[-1] == {"role": "user", "content": "question 3"}
+    assert len(messages) == 4
+
+    with pytest.raises(ValueError):
+        Conversation(max_turns=0)
+
+
 @responses.activate
 def test_retry_mechanism(api):
     """Test retry mechanism for failed requests."""
@@ -108,3 +172,304 @@ def test_retry_mechanism(api):
 
     response = api.get_completion([{"role": "user", "content": "test"}])
     assert "choices" in response
+
+
+@responses.activate
+def test_response_caching(api, tmp_path):
+    """Test that cached responses skip the API call."""
+    api._cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    responses.add(
+        responses.POST,
+        "https://api.perplexity.ai/chat/completions",
+        json={"choices": [{"message": {"content": "Cached"}}]},
+        status=200,
+    )
+
+    request = [{"role": "user", "content": "test"}]
+    first = api.get_completion(request, cache=True)
+    second = api.get_completion(request, cache=True)
+    assert first == second
+    assert len(responses.calls) == 1
+
+    # Caching is off by default when the temperature is above zero
+    api.get_completion(request)
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_similar_prompt_matching_is_opt_in(api, tmp_path):
+    """Test near-duplicate prompts only reuse responses when asked to."""
+    api._cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    responses.add(
+        responses.POST,
+        "https://api.perplexity.ai/chat/completions",
+        json={"choices": [{"message": {"content": "Cached"}}]},
+        status=200,
+    )
+
+    api.get_completion([{"role": "user", "content": "What is Python?"}], cache=True)
+    api.get_completion([{"role": "user", "content": "what is python"}], cache=True)
+    assert len(responses.calls) == 2
+
+    request = [{"role": "user", "content": "Explain the Python language"}]
+    api.get_completion(request, cache=True, match_similar=True)
+    similar = [{"role": "user", "content": "explain the python language?"}]
+    api.get_completion(similar, cache=True, match_similar=True)
+    assert len(responses.calls) == 3
+
+
+@responses.activate
+def test_completion_batch(api):
+    """Test concurrent completion requests keep their order."""
+
+    def echo(request):
+        content = json.loads(request.body)["messages"][-1]["content"]
+        return 200, {}, json.dumps({"choices": [{"message": {"content": content}}]})
+
+    responses.add_callback(
+        responses.POST, "https://api.perplexity.ai/chat/completions", callback=echo
+    )
+
+    batch = [[{"role": "user", "content": f"question {i}"}] for i in range(3)]
+    results = api.get_completion_batch(batch)
+    assert len(responses.calls) == 3
+    assert [r["choices"][0]["message"]["content"] for r in results] == [
+        "question 0",
+        "question 1",
+        "question 2",
+    ]
+
+
+@responses.activate
+def test_completion_batch_is_capped_at_pool_size(api):
+    """Test a batch never has more requests in flight than pooled connections."""
+    lock = threading.Lock()
+    in_flight = []
+    peak = []
+
+    def slow(request):
+        with lock:
+            in_flight.append(request)
+            peak.append(len(in_flight))
+        time.sleep(0.05)
+        with lock:
+            in_flight.remove(request)
+        return 200, {}, json.dumps({"choices": [{"message": {"content": "ok"}}]})
+
+    responses.add_callback(
+        responses.POST, "https://api.perplexity.ai/chat/completions", callback=slow
+    )
+
+    batch = [[{"role": "user", "content": f"question {i}"}] for i in range(12)]
+    api.get_completion_batch(batch, max_workers=8)
+    assert max(peak) <= POOL_MAXSIZE
+
+
+@responses.activate
+def test_completion_batch_with_cache(tmp_path, monkeypatch):
+    """Test concurrent completion requests can share the response cache."""
+    monkeypatch.chdir(tmp_path)  # The cache is opened by the worker threads
+    monkeypatch.setenv("PPLX_API_KEY", "test-key")
+    monkeypatch.setenv("PPLX_TEMPERATURE", "0.0")
+    reset_config()
+    api = PerplexityAPI()
+    reset_config()
+
+    def echo(request):
+        body = json.loads(request.body)
+        assert body["temperature"] == 0.0
+        content = body["messages"][-1]["content"]
+        return 200, {}, json.dumps({"choices": [{"message": {"content": content}}]})
+
+    responses.add_callback(
+        responses.POST, "https://api.perplexity.ai/chat/completions", callback=echo
+    )
+
+    batch = [[{"role": "user", "content": f"question {i % 16}"}] for i in range(32)]
+    results = api.get_completion_batch(batch, max_workers=8)
+    assert [r["choices"][0]["message"]["content"] for r in results] == [
+        f"question {i % 16}" for i in range(32)
+    ]
+    calls = len(responses.calls)
+    assert api.get_completion_batch(batch, max_workers=8) == results
+    assert len(responses.calls) == calls  # Second batch is served from the cache
+    api._cache.close()
+
+
+def test_request_settings_are_read_only(api):
+    """Test the settings used for caching match the payload that is sent."""
+    assert api.temperature == api._payload_template["temperature"]
+    with pytest.raises(AttributeError):
+        api.temperature = 0.0
+
+
+def test_retry_configuration(api):
+    """Test the session adapter retries error statuses on POST."""
+    retries = api.session.get_adapter(api.base_url).max_retries
+    assert retries.total == 3
+    assert "POST" in retries.allowed_methods
+    assert retries.read is False  # read timeouts are reported, not retried
+    assert {429, 500, 502, 503, 504} <= set(retries.status_forcelist)
+    assert retries.respect_retry_after_header
+
+
+@responses.activate
+def test_retry_exhausted(api):
+    """Test the last error response is reported once retries run out."""
+    responses.add(
+        responses.POST,
+        "https://api.perplexity.ai/chat/completions",
+        json={"error": "Service Unavailable"},
+        status=503,
+        headers={"Retry-After": "0"},
+    )
+
+    with pytest.raises(APIError) as exc:
+        api.get_completion([{"role": "user", "content": "test"}])
+    assert "Service Unavailable" in str(exc.value)
+    assert len(responses.calls) == 4
+
+
+def test_retry_after_is_capped(api, monkeypatch):
+    """Test a long Retry-After is capped when retried by the real adapter."""
+    posts = []
+
+    class RateLimited(BaseHTTPRequestHandler):
+        def do_POST(self):
+            posts.append(self.rfile.read(int(self.headers["Content-Length"])))
+            body = b'{"error": "Too Many Requests"}'
+            self.send_response(429)
+            self.send_header("Retry-After", "3600")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), RateLimited)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    sleeps = []
+    monkeypatch.setattr(urllib3.util.retry.time, "sleep", sleeps.append)
+    api.base_url = f"http://127.0.0.1:{server.server_port}/chat/completions"
+
+    try:
+        with pytest.raises(APIError) as exc:
+            api.get_completion([{"role": "user", "content": "test"}])
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert "Too Many Requests" in str(exc.value)
+    assert len(posts) == 4
+    assert sleeps == [MAX_BACKOFF] * 3
+
+
+@responses.activate
+def test_streaming_completion(api):
+    """Test streamed responses are yielded fragment by fragment."""
+    events = [
+        {"choices": [{"delta": {"content": "Hello"}}]},
+        {"choices": [{"delta": {"content": ", world"}}]},
+        {"choices": [{"delta": {}}]},
+    ]
+    body = "".join(f"data: {json.dumps(event)}\n\n" for event in events)
+    responses.add(
+        responses.POST,
+        "https://api.perplexity.ai/chat/completions",
+        body=body + "data: [DONE]\n\n",
+        status=200,
+        content_type="text/event-stream",
+    )
+
+    fragments = list(api.get_completion_stream([{"role": "user", "content": "test"}]))
+    assert fragments == ["Hello", ", world"]
+    assert json.loads(responses.calls[0].request.body)["stream"] is True
+
+
+@responses.activate
+def test_streaming_error_handling(api):
+    """Test streaming errors are raised as APIError."""
+    responses.add(
+        responses.POST,
+        "https://api.perplexity.ai/chat/completions",
+        json={"error": "Invalid API key"},
+        status=401,
+    )
+
+    with pytest.raises(APIError) as exc:
+        list(api.get_completion_stream([{"role": "user", "content": "test"}]))
+    assert "Invalid API key" in str(exc.value)
+
+
+@responses.activate
+def test_streaming_invalid_chunk(api):
+    """Test malformed stream chunks are raised as APIError."""
+    responses.add(
+        responses.POST,
+        "https://api.perplexity.ai/chat/completions",
+        body="data: {not json}\n\n",
+        status=200,
+        content_type="text/event-stream",
+    )
+
+    with pytest.raises(APIError) as exc:
+        list(api.get_completion_stream([{"role": "user", "content": "test"}]))
+    assert "Invalid JSON in stream chunk" in str(exc.value)
+
+
+@pytest.mark.parametrize(
+    "chunk", ["123", '{"choices": [{"delta": null}]}', '{"choices": [null]}']
+)
+@responses.activate
+def test_streaming_unexpected_chunk(api, chunk):
+    """Test stream chunks with an unexpected shape are raised as APIError."""
+    responses.add(
+        responses.POST,
+        "https://api.perplexity.ai/chat/completions",
+        body=f"data: {chunk}\n\n",
+        status=200,
+        content_type="text/event-stream",
+    )
+
+    with pytest.raises(APIError) as exc:
+        list(api.get_completion_stream([{"role": "user", "content": "test"}]))
+    assert "Invalid stream chunk" in str(exc.value)
+
+
+@responses.activate
+def test_async_completion(api):
+    """Test awaiting several completions concurrently."""
+    responses.add(
+        responses.POST,
+        "https://api.perplexity.ai/chat/completions",
+        json={"choices": [{"message": {"content": "Success"}}]},
+        status=200,
+    )
+
+    async def run():
+        batch = [[{"role": "user", "content": f"question {i}"}] for i in range(3)]
+        return await asyncio.gather(*(api.aget_completion(m) for m in batch))
+
+    results = asyncio.run(run())
+    assert len(results) == 3
+    assert len(responses.calls) == 3
+
+
+@responses.activate
+def test_async_completion_matches_similar(api, tmp_path):
+    """Test the async API can reuse responses to near-duplicate prompts."""
+    api._cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    responses.add(
+        responses.POST,
+        "https://api.perplexity.ai/chat/completions",
+        json={"choices": [{"message": {"content": "Success"}}]},
+        status=200,
+    )
+
+    async def run():
+        for prompt in ("Explain the Python language", "explain the python language?"):
+            request = [{"role": "user", "content": prompt}]
+            await api.aget_completion(request, cache=True, match_similar=True)
+
+    asyncio.run(run())
+    assert len(responses.calls) == 1
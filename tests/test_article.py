@@ -4,7 +4,7 @@ Tests for the Article class and related functionality.
 
 import pytest
 
-from article import Article, ArticleError, convert_to_uk_english
+from article import Article, ArticleError, _to_uk_word, convert_to_uk_english
 
 
 def test_article_creation():
@@ -72,6 +72,39 @@ def test_citation_extraction():
     assert citations[0]["url"] == "https://example.com"
 
 
+def test_citation_numbers_from_text():
+    """Test numbered source lines keep their numbers."""
+    text = """3. https://third.com
+    7. https://seventh.com"""
+
+    citations = Article._extract_citations(text)
+    assert citations == [
+        {"number": 3, "url": "https://third.com"},
+        {"number": 7, "url": "https://seventh.com"},
+    ]
+
+    # Unnumbered URLs are still picked up
+    citations = Article._extract_citations("See https://example.com and www.test.com")
+    assert [c["number"] for c in citations] == [1, 2]
+
+
+def test_citation_extraction_mixed_formats():
+    """Test citations keep their order and the numbers given in the text."""
+    text = """1. https://first.com
+    [2] https://second.com
+    See <https://docs.com> and www.bare.com
+    3. https://third.com"""
+
+    citations = Article._extract_citations(text)
+    assert citations == [
+        {"number": 1, "url": "https://first.com"},
+        {"number": 2, "url": "https://second.com"},
+        {"number": 4, "url": "https://docs.com"},
+        {"number": 5, "url": "www.bare.com"},
+        {"number": 3, "url": "https://third.com"},
+    ]
+
+
 def test_uk_english_conversion():
     """Test conversion to UK English."""
     us_text = "The color of the theater is gray."
@@ -81,6 +114,22 @@ def test_uk_english_conversion():
     )  # At least some words should be converted
 
 
+def test_uk_english_preserves_formatting():
+    """Test conversion keeps whitespace, punctuation and URLs intact."""
+    us_text = "## The Color Center\n\n- Gray areas, see https://example.com/color."
+    assert convert_to_uk_english(us_text) == (
+        "## The Colour Centre\n\n- Grey areas, see https://example.com/color."
+    )
+
+
+def test_uk_word_lookup():
+    """Test single-word spelling lookup preserves capitalisation."""
+    assert _to_uk_word("color") == "colour"
+    assert _to_uk_word("Theater") == "Theatre"
+    assert _to_uk_word("GRAY") == "GREY"
+    assert _to_uk_word("table") == "table"
+
+
 def test_article_from_response():
     """Test article creation from API response text."""
     response_text = """# Test Title: A Description
@@ -97,6 +146,41 @@ This is the content of the article.
     assert len(article.citations) == 2
 
 
+def test_article_from_response_keeps_full_urls():
+    """Test cleaning does not split URLs in the content or the sources."""
+    response_text = """# Test Title: A Description
+
+See https://example.com/color.html for details.It helps.
+
+# Sources
+1. https://example.com/page?id=1
+[2] www.test.com/docs/index.html"""
+
+    article = Article.from_response(response_text)
+    assert article.content == (
+        "See https://example.com/color.html for details. It helps."
+    )
+    assert article.citations == [
+        {"number": 1, "url": "https://example.com/page?id=1"},
+        {"number": 2, "url": "www.test.com/docs/index.html"},
+    ]
+
+
+def test_article_from_response_uk_english():
+    """Test title, description and content are all converted."""
+    article = Article.from_response("# Color Guide: The gray center\n\nA theater of color.")
+    assert article.title == "Colour Guide"
+    assert article.description == "The grey centre"
+    assert article.content == "A theatre of colour."
+
+
+def test_title_extraction():
+    """Test title and description parsing from the first line."""
+    assert Article._extract_title_description("# Title: Desc\nBody") == ("Title", "Desc")
+    assert Article._extract_title_description("# Title\nBody: more") == ("Title", "")
+    assert Article._extract_title_description("No heading") == ("Untitled", "")
+
+
 def test_error_handling():
     """Test error handling in article processing."""
     with pytest.raises(ArticleError):
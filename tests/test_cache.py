@@ -0,0 +1,110 @@
+"""
+Tests for response caching.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cache import ResponseCache, SemanticCache, make_cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Create a test cache in a temporary directory."""
+    response_cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    yield response_cache
+    response_cache.close()
+
+
+def test_cache_key_is_stable():
+    """Test that equal requests produce the same key."""
+    messages = [{"role": "user", "content": "test"}]
+    key = make_cache_key("model", 0.0, 100, messages)
+    assert key == make_cache_key("model", 0.0, 100, list(messages))
+    assert key != make_cache_key("model", 0.5, 100, messages)
+    assert key != make_cache_key("model", 0.0, 100, [{"role": "user", "content": "x"}])
+
+
+def test_cache_round_trip(cache):
+    """Test storing and retrieving a response."""
+    response = {"choices": [{"message": {"content": "Cached"}}]}
+    assert cache.get("key") is None
+
+    cache.set("key", response)
+    assert cache.get("key") == response
+
+
+def test_cache_expiry(cache):
+    """Test that expired responses are not returned and can be evicted."""
+    cache.set("stale", {"value": 1}, expire=-1)
+    cache.set("fresh", {"value": 2})
+
+    assert cache.get("stale") is None
+    assert cache.expire() == 1
+    assert cache.get("fresh") == {"value": 2}
+
+
+def test_cache_concurrent_access(cache):
+    """Test the cache can be shared between threads."""
+
+    def worker(i):
+        for j in range(50):
+            cache.set(f"key {i} {j}", {"value": j})
+            assert cache.get(f"key {i} {j}") == {"value": j}
+            cache.expire()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(worker, range(8)))
+    assert cache.get("key 7 49") == {"value": 49}
+
+
+def test_semantic_cache_matches_similar_prompts():
+    """Test that near-duplicate prompts share a cached response."""
+    semantic_cache = SemanticCache(similarity_threshold=0.8)
+    response = {"choices": [{"message": {"content": "Python is a language"}}]}
+    semantic_cache.add("ctx", "What is the Python programming language?", response)
+
+    assert semantic_cache.get("ctx", "what is the python programming language") == response
+    assert semantic_cache.get("ctx", "How do I cook rice?") is None
+    assert semantic_cache.get("other", "What is the Python programming language?") is None
+
+
+def test_semantic_cache_concurrent_access():
+    """Test entries can be added and matched from several threads at once."""
+    semantic_cache = SemanticCache(max_entries=16)
+
+    def worker(i):
+        for j in range(200):
+            semantic_cache.add("ctx", f"question {i} number {j}", {"value": j})
+            semantic_cache.get("ctx", f"question {i} number {j}")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(worker, range(8)))
+    semantic_cache.add("ctx", "final question", {"value": "final"})
+    assert semantic_cache.get("ctx", "final question") == {"value": "final"}
+
+
+def test_semantic_cache_respects_word_order():
+    """Test that reordered prompts do not share a cached response."""
+    semantic_cache = SemanticCache()
+    semantic_cache.add("ctx", "convert USD to EUR", {"value": 1})
+
+    assert semantic_cache.get("ctx", "convert usd to eur") == {"value": 1}
+    assert semantic_cache.get("ctx", "convert EUR to USD") is None
+
+
+def test_semantic_cache_is_bounded():
+    """Test that old entries and contexts are evicted."""
+    semantic_cache = SemanticCache(max_entries=2, max_contexts=2)
+    for i in range(3):
+        semantic_cache.add("ctx", f"question number {i}", {"value": i})
+
+    assert semantic_cache.get("ctx", "question number 0") is None
+    assert semantic_cache.get("ctx", "question number 2") == {"value": 2}
+
+    semantic_cache.add("second", "another question", {"value": 3})
+    semantic_cache.get("ctx", "question number 2")  # Marks ctx as recently used
+    semantic_cache.add("third", "another question", {"value": 4})
+    assert semantic_cache.get("second", "another question") is None
+    assert semantic_cache.get("ctx", "question number 1") == {"value": 1}
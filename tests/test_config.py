@@ -4,6 +4,7 @@ Tests for configuration management.
 
 import os
 
+import dotenv
 import pytest
 
 from config import ConfigurationError, ModelConfig, reset_config
@@ -60,6 +61,7 @@ def test_env_loading(monkeypatch):
         "PPLX_MAX_TOKENS": "2000",
         "PPLX_MODEL": "test-model",
         "PPLX_API_BASE": "https://test.com",
+        "PPLX_MAX_HISTORY": "5",
     }
 
     for key, value in test_env.items():
@@ -71,6 +73,7 @@ def test_env_loading(monkeypatch):
     assert config.max_tokens == 2000
     assert config.name == "test-model"
     assert config.api_base == "https://test.com"
+    assert config.max_history == 5
 
 
 def test_missing_api_key(monkeypatch):
@@ -99,3 +102,35 @@ def test_default_values():
     assert config.name == "sonar-deep-research"
     assert config.temperature == 0.7
     assert config.max_tokens == 4000
+    assert config.max_history == 20
+
+
+def test_config_is_immutable():
+    """Test that configuration cannot be modified after creation."""
+    config = ModelConfig(api_key="test-key")
+    with pytest.raises(AttributeError):
+        config.temperature = 0.1
+
+
+def test_env_values_are_validated(monkeypatch):
+    """Test that values from the environment are validated."""
+    monkeypatch.setenv("PPLX_API_KEY", "test-key")
+    monkeypatch.setenv("PPLX_TEMPERATURE", "1.5")
+
+    with pytest.raises(ConfigurationError):
+        ModelConfig.load_from_env(env_file=False)
+
+
+def test_env_file_read_when_key_exported(monkeypatch):
+    """Test .env settings still load when only the API key is exported."""
+    monkeypatch.setenv("PPLX_API_KEY", "test-key")
+    monkeypatch.delenv("PPLX_MODEL", raising=False)
+    monkeypatch.setattr(
+        dotenv,
+        "load_dotenv",
+        lambda *args, **kwargs: monkeypatch.setenv("PPLX_MODEL", "env-file-model"),
+    )
+
+    config = ModelConfig.load_from_env()
+    assert config.name == "env-file-model"
+    assert config.api_key == "test-key"
@@ -0,0 +1,107 @@
+"""
+Tests for utility functions.
+"""
+
+import io
+import sys
+
+import pytest
+
+from utils import (
+    ProgressBar,
+    clean_think_tags,
+    format_response,
+    format_time,
+    get_multiline_input,
+)
+
+
+def test_clean_think_tags():
+    """Test removal of think blocks."""
+    assert clean_think_tags("a<think>hidden</think>b<think>x</think>c") == "abc"
+    assert clean_think_tags("no tags here") == "no tags here"
+    assert clean_think_tags("kept <think>unclosed") == "kept <think>unclosed"
+
+
+def test_clean_think_tags_unbalanced():
+    """Test unbalanced and nested tags are handled in a single pass."""
+    assert clean_think_tags("<think>a<think>b</think>c") == "c"
+    assert clean_think_tags("<think>a<think>b</think>c</think>d") == "c</think>d"
+    unclosed = "<think>" * 100_000 + "x" * 100_000
+    assert clean_think_tags(unclosed) == unclosed
+
+
+def test_format_response():
+    """Test response formatting with citations."""
+    response = {
+        "choices": [{"message": {"content": "<think>plan</think>Answer"}}],
+        "citations": ["https://example.com", "https://test.com"],
+    }
+    assert format_response(response, 1.0) == (
+        "\n\nAnswer\n\n# Sources\n----------\n"
+        "1. https://example.com\n2. https://test.com\n"
+    )
+
+
+def test_format_response_without_citations():
+    """Test response formatting without citations."""
+    response = {"choices": [{"message": {"content": "Answer"}}]}
+    assert format_response(response, 1.0) == "\n\nAnswer"
+
+    # An empty citation list adds no sources section
+    response["citations"] = []
+    assert format_response(response, 1.0) == "\n\nAnswer"
+
+
+def test_format_time():
+    """Test elapsed time formatting."""
+    assert format_time(0) == "0m:0s"
+    assert format_time(59.9) == "0m:59s"
+    assert format_time(125.2) == "2m:5s"
+
+
+def test_progress_bar_skips_non_tty(capsys):
+    """Test that nothing is drawn when stdout is not a terminal."""
+    progress = ProgressBar()
+    assert progress.run(sum, (1, 2, 3)) == 6
+    assert capsys.readouterr().out == ""
+
+
+def test_progress_bar_run_raises():
+    """Test that errors from the wrapped call are re-raised."""
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        ProgressBar().run(fail)
+
+
+def test_progress_bar_tick(monkeypatch):
+    """Test frames bounce between the ends of the bar."""
+    output = io.StringIO()
+    monkeypatch.setattr(sys, "stdout", output)
+    progress = ProgressBar(width=3)
+    progress._isatty = True
+    for offset in range(5):
+        progress.tick(progress.start_time + offset * 0.1)
+    assert output.getvalue() == "".join(
+        f"\rProcessing [{frame}] 0m:0s"
+        for frame in ("#--", "-#-", "--#", "-#-", "#--")
+    )
+
+
+def test_multiline_input_from_pipe(monkeypatch):
+    """Test that piped input is read in one go."""
+    monkeypatch.setattr(sys, "stdin", io.StringIO("\nfirst line\n\nsecond line\n"))
+    assert get_multiline_input() == "first line\n\nsecond line"
+
+
+def test_multiline_input_from_terminal(monkeypatch):
+    """Test interactive input stops at a blank line and keeps indentation."""
+    stdin = io.StringIO()
+    stdin.isatty = lambda: True
+    monkeypatch.setattr(sys, "stdin", stdin)
+    typed = iter(["", "first line", "    indented", "  ", "ignored"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(typed))
+    assert get_multiline_input() == "first line\n    indented"
@@ -3,16 +3,33 @@ Utility functions for the Perplexity AI chat interface.
 Contains helper functions for input handling, formatting, and progress tracking.
 """
 
-import re
+import io
+import sys
 import threading
 import time
-from typing import Any, Dict, List
+from itertools import count
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+# Tags delimiting reasoning blocks in model output
+_THINK_OPEN = "<think>"
+_THINK_CLOSE = "</think>"
+
+# Heading placed above the numbered citations in formatted responses
+_SOURCES_HEADER = "\n\n# Sources\n----------\n"
+
+# Progress bar cells; plain ASCII renders the same on every console
+_BAR_EMPTY = "-"
+_BAR_CURSOR = "#"
+_FRAME_TEMPLATE = "\rProcessing [%s] %s"
+
+T = TypeVar("T")
 
 
 def get_multiline_input() -> str:
     """
     Get multiline input from user until they enter an empty line.
-    Each line is prefixed with a '>' prompt.
+    Each line is prefixed with a '>' prompt. When stdin is not a terminal,
+    such as piped input, all of it is read at once instead.
 
     Returns:
         str: The combined multiline input as a single string.
@@ -20,16 +37,20 @@ def get_multiline_input() -> str:
     Raises:
         KeyboardInterrupt: If user interrupts the input process.
     """
+    if not sys.stdin.isatty():
+        return sys.stdin.read().strip()
+
     print("\nEnter your question (press Enter twice to finish):")
-    lines = []
+    buf = io.StringIO()
     try:
         while True:
-            line = input("> ").strip()
-            if not line and lines:  # Empty line and we have content
+            line = input("> ")
+            if line and not line.isspace():  # Keep indentation as typed
+                buf.write(line)
+                buf.write("\n")
+            elif buf.tell():  # Empty line and we have content
                 break
-            if line:  # Add non-empty lines
-                lines.append(line)
-        return "\n".join(lines)
+        return buf.getvalue().rstrip("\n")
     except KeyboardInterrupt:
         print("\nExiting program...")
         raise
@@ -45,8 +66,7 @@ def format_time(seconds: float) -> str:
     Returns:
         str: Formatted time string in the format "Xm:Ys".
     """
-    minutes = int(seconds // 60)
-    remaining_seconds = int(seconds % 60)
+    minutes, remaining_seconds = divmod(int(seconds), 60)
     return f"{minutes}m:{remaining_seconds}s"
 
 
@@ -54,13 +74,31 @@ def clean_think_tags(text: str) -> str:
     """
     Remove any content between <think> tags from the text.
 
+    Each <think> is paired with the next </think>; an unclosed <think> and
+    everything after it is left in place.
+
     Args:
         text (str): The text to clean.
 
     Returns:
         str: The cleaned text with think tags and their content removed.
     """
-    return re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL)
+    if _THINK_OPEN not in text:
+        return text  # Most responses have no reasoning block
+
+    parts = []
+    start = 0
+    while True:
+        open_at = text.find(_THINK_OPEN, start)
+        if open_at < 0:
+            break
+        close_at = text.find(_THINK_CLOSE, open_at + len(_THINK_OPEN))
+        if close_at < 0:
+            break
+        parts.append(text[start:open_at])
+        start = close_at + len(_THINK_CLOSE)
+    parts.append(text[start:])
+    return "".join(parts)
 
 
 def format_response(response: Dict[str, Any], elapsed_time: float) -> str:
@@ -75,29 +113,31 @@ def format_response(response: Dict[str, Any], elapsed_time: float) -> str:
         str: Formatted response text with citations if available.
     """
     # Clean the response content
-    content = clean_think_tags(response["choices"][0]["message"]["content"])
+    message = response["choices"][0]["message"]
+    content = clean_think_tags(message["content"])
+    citations = response.get("citations")
 
-    output = f"""
+    parts = ["\n\n", content]
 
-{content}"""
+    # Add citations if they exist; the pieces are joined once at the end
+    if citations:
+        parts.append(_SOURCES_HEADER)
+        parts.append("\n".join(map("{0}. {1}".format, count(1), citations)))
+        parts.append("\n")
 
-    # Add citations if they exist
-    if "citations" in response:
-        output += "\n\n# Sources\n----------\n"
-        for i, citation in enumerate(response["citations"], 1):
-            output += f"{i}. {citation}\n"
-
-    return output
+    return "".join(parts)
 
 
 class ProgressBar:
     """
     A class to display an animated progress bar with elapsed time.
 
+    The bar is drawn from the calling thread: each tick() writes the next
+    frame, and run() ticks while a blocking call completes.
+
     Attributes:
         width (int): The width of the progress bar in characters.
-        stop_event (threading.Event): Event to control the animation thread.
-        start_time (float): The time when the progress bar started.
+        start_time (float): The monotonic time when the progress bar started.
     """
 
     def __init__(self, width: int = 30):
@@ -108,45 +148,100 @@ class ProgressBar:
             width (int): The width of the progress bar in characters.
         """
         self.width = width
-        self.stop_event = threading.Event()
-        self.start_time = time.time()
+        self.start_time = time.monotonic()
+
+        # Cursor positions for one sweep right and back; ticks index into it
+        last = width - 1
+        self._positions = tuple(last - abs(last - i) for i in range(2 * last)) or (0,)
+        self._tick = 0
+
+        # The elapsed time only changes once a second, every tenth tick
+        self._last_second = -1
+        self._elapsed_str = ""
+
+        # Only `width` distinct frames exist, one per cursor position
+        self._frames = tuple(
+            _BAR_EMPTY * pos + _BAR_CURSOR + _BAR_EMPTY * (width - pos - 1)
+            for pos in range(width)
+        )
+
+        # Blank line that overwrites the bar and elapsed time when clearing
+        self._clear_line = "\r" + " " * (width + 30) + "\r"
 
-    def animate(self) -> None:
+        # Bind output methods once; the bar is only drawn on a terminal
+        self._write = sys.stdout.write
+        self._flush = sys.stdout.flush
+        self._isatty = sys.stdout.isatty()
+
+    def tick(self, now: Optional[float] = None) -> None:
         """
-        Animate the progress bar by moving a cursor back and forth.
+        Draw the next frame, moving the cursor one step back or forth.
         Displays elapsed time alongside the progress bar.
+
+        Nothing is drawn when stdout is not a terminal, such as when output
+        is redirected to a file or pipe.
+
+        Args:
+            now (float, optional): Current monotonic time. Defaults to now.
+        """
+        if not self._isatty:
+            return
+        if now is None:
+            now = time.monotonic()
+
+        second = int(now - self.start_time)
+        if second != self._last_second:
+            self._elapsed_str = format_time(second)
+            self._last_second = second
+
+        # Print progress bar with elapsed time
+        pos = self._positions[self._tick % len(self._positions)]
+        self._write(_FRAME_TEMPLATE % (self._frames[pos], self._elapsed_str))
+        self._flush()
+        self._tick += 1
+
+    def clear(self) -> None:
+        """Clean up the display once the progress bar is no longer needed."""
+        if not self._isatty:
+            return
+        self._write(self._clear_line)  # Clear the progress bar
+        self._flush()
+
+    def run(self, func: Callable[..., T], *args: Any, interval: float = 0.1) -> T:
+        """
+        Call a blocking function, ticking the progress bar until it returns.
+
+        The call runs on a daemon worker thread so that an interrupted
+        program can exit without waiting for it.
+
+        Args:
+            func (Callable): The function to call.
+            *args: Positional arguments for the function.
+            interval (float): Seconds between frames.
+
+        Returns:
+            The function's return value.
+
+        Raises:
+            Exception: Whatever the function raised.
         """
-        pos = 0
-        direction = 1  # 1 for right, -1 for left
-        while not self.stop_event.is_set():
-            # Calculate elapsed time
-            elapsed = time.time() - self.start_time
-            elapsed_str = format_time(elapsed)
-
-            # Create the progress bar
-            bar = ["-"] * self.width
-            bar[pos] = "█"
-            progress = "".join(bar)
-
-            # Print progress bar with elapsed time
-            print(f"\rProcessing [{progress}] {elapsed_str}", end="", flush=True)
-
-            # Update position
-            pos += direction
-            if pos == self.width - 1 or pos == 0:
-                direction *= -1  # Reverse direction at ends
-
-            time.sleep(0.1)
-
-    def start(self) -> None:
-        """Start the progress bar animation in a separate thread."""
-        self.thread = threading.Thread(target=self.animate)
-        self.thread.start()
-
-    def stop(self) -> None:
-        """Stop the progress bar animation and clean up the display."""
-        self.stop_event.set()
-        self.thread.join()
-        print(
-            "\r" + " " * (self.width + 30) + "\r", end="", flush=True
-        )  # Clear the progress bar
+        outcome: Dict[str, Any] = {}
+
+        def target() -> None:
+            try:
+                outcome["result"] = func(*args)
+            except BaseException as e:
+                outcome["error"] = e
+
+        worker = threading.Thread(target=target, daemon=True)
+        worker.start()
+        try:
+            while worker.is_alive():
+                self.tick()
+                worker.join(interval)
+        finally:
+            self.clear()
+
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]